@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 import time
@@ -5,7 +6,18 @@ import time
 from functions.checks import check
 from functions.download import Download
 from functions.archive import Archive
+from functions.daemon import Daemon
 from functions.functions import YTA
+from functions.layout import Layout
+from functions.sidecars import Sidecars
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--daemon', metavar='SUBSCRIPTIONS', help='run without the menu, keeping the channels in the given subscriptions file archived')
+parser.add_argument('--workers', type=int, help='how many subscriptions may be checked at the same time, overrides the subscriptions file')
+args = parser.parse_args()
+
+if args.daemon:
+    args.daemon = os.path.abspath(args.daemon) #resolved before changing into the script folder below
 
 try:
     os.chdir(os.path.dirname(__file__))
@@ -23,6 +35,10 @@ ytdl = check.ytdlcheck(selfpath, ytdl, ytdlprint)
 
 check.ffmpegcheck()
 
+if args.daemon:
+    Daemon.run(ytdl, args.daemon, args.workers)
+    sys.exit()
+
 #Main menu for the user
 while True:
     returntomenu = True
@@ -31,12 +47,18 @@ while True:
     print('Please select an option')
     print('\n[D]ownload')
     print('\n[A]rchive')
+    print('\n[M]igrate archive to sharded layout')
+    print('\n[U]npack sidecars')
     print('\n[E]xit')
     mmchoice = input('\n: ').upper()
     if mmchoice == 'D':
         Download.download(ytdl, ytdlprint, returntomenu)
     elif mmchoice == 'A':
         Archive.archive(ytdl, ytdlprint, returntomenu)
+    elif mmchoice == 'M':
+        Layout.MigrateMenu()
+    elif mmchoice == 'U':
+        Sidecars.ExtractMenu()
     elif mmchoice == 'E':
         sys.exit()
     elif 'D' and 'A' and 'E' in mmchoice and len(mmchoice) == 3:
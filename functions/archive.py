@@ -2,11 +2,28 @@ import sys
 import time
 
 from functions.functions import YTA
+from functions.layout import Layout
 from functions.mainfunc import mainfunc
+from functions.sidecars import Sidecars
 
 
 class Archive():
 
+    archiveflags = ['--write-description', '--write-annotations', '--write-info-json', '--write-thumbnail', '--all-subs', '--sub-format', '"best/ass/srt"', '--embed-subs', '--no-overwrites', '--no-continue', '--sleep-interval', '5', '--max-sleep-interval', '10', '--add-metadata', '--compat-options', 'no-live-chat']
+
+    def OutputTemplate(link_type, cmd, layout):
+        if layout == 'sharded':
+            return Layout.output_template
+        if link_type == 'channel':
+            return '%(uploader)s/%(uploader)s - %(upload_date)s - %(title)s/%(uploader)s - %(upload_date)s [%(id)s].%(ext)s'
+        elif link_type == 'playlist':
+            if '--no-playlist' in cmd:
+                return '%(uploader)s/%(upload_date)s - %(title)s/%(upload_date)s [%(id)s].%(ext)s'
+            else:
+                return '%(playlist_title)s/%(uploader)s/%(upload_date)s - %(title)s/%(upload_date)s [%(id)s].%(ext)s'
+        else:
+            return '%(title)s - %(uploader)s - %(upload_date)s/%(uploader)s - %(upload_date)s [%(id)s].%(ext)s'
+
     def archive(ytdl, ytdlprint, returntomenu):
         mode = 'archive'
         while True:    
@@ -19,28 +36,34 @@ class Archive():
             if returntomenu:
                 archivelist = mainfunc.SelectArchive(ytdlprint)
 
+            if returntomenu:
+                layout = Layout.SelectLayout()
+
+            if returntomenu:
+                pack = Sidecars.SelectPack()
+
             cmd, link_type = mainfunc.ArchiveType(dURL, ytdl, dest, archivelist)
 
-            cmd.extend(['--write-description', '--write-annotations', '--write-info-json', '--write-thumbnail', '--all-subs', '--sub-format', '"best/ass/srt"', '--embed-subs', '--no-overwrites', '--no-continue', '--sleep-interval', '5', '--max-sleep-interval', '10', '--add-metadata', '--compat-options', 'no-live-chat'])
+            cmd.extend(Archive.archiveflags)
 
             if returntomenu:
                 testprompt = mainfunc.Test(ytdl, dest, path, dURL)
                 if testprompt == 'N':
                     return
             
-            if link_type == 'channel':
-                output_template = '%(uploader)s/%(uploader)s - %(upload_date)s - %(title)s/%(uploader)s - %(upload_date)s [%(id)s].%(ext)s'
-            if link_type == 'playlist':
-                if '--no-playlist' in cmd:
-                    output_template = '%(uploader)s/%(upload_date)s - %(title)s/%(upload_date)s [%(id)s].%(ext)s'
-                else:
-                    output_template = '%(playlist_title)s/%(uploader)s/%(upload_date)s - %(title)s/%(upload_date)s [%(id)s].%(ext)s'
-            else:
-                output_template = '%(title)s - %(uploader)s - %(upload_date)s/%(uploader)s - %(upload_date)s [%(id)s].%(ext)s'
+            output_template = Archive.OutputTemplate(link_type, cmd, layout)
 
             output = mainfunc.CreateDirectoryAndOutput(dest, path, output_template)
             
             mainfunc.DownloadMode(dURL, output, cmd, dest, mode)
+
+            if pack:
+                print('\nPacking sidecars...')
+                Sidecars.Pack(dest)
+
+            if layout == 'sharded':
+                print('\nBuilding index...')
+                Layout.BuildIndex(dest)
             
             while True:
                 returnmode = input('\n[E]xit, return to [M]ain menu or to [I]nput field using previous settings? E/M/I: ').upper()
@@ -0,0 +1,168 @@
+import heapq
+import json
+import os
+import queue
+import random
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from functions.archive import Archive
+from functions.layout import Layout
+from functions.sidecars import Sidecars
+
+
+class Daemon:
+
+    formats = {'A': 'ba[ext=m4a]', 'V': 'bv[ext=mp4]', 'AV': 'bv[ext=mp4]+ba[ext=m4a]/b[ext=mp4]'} #same format selections as the A/V/AV choices in the menu
+    defaults = {'archive': 'archive', 'mode': 'AV', 'interval': 1440, 'priority': 0, 'layout': 'nested', 'pack': False} #interval is in minutes
+
+    def log(message):
+        print(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] {message}', flush=True)
+
+    def IsNumber(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool) #bool is a subclass of int
+
+    def CheckWorkers(workers):
+        if not isinstance(workers, int) or isinstance(workers, bool) or workers <= 0:
+            raise ValueError(f'"workers" must be a positive whole number: {workers}')
+
+    def LoadSubscriptions(subsfile):
+        with open(subsfile, encoding='utf-8') as f:
+            config = json.load(f)
+        Daemon.CheckWorkers(config.get('workers', 2))
+        jitter = config.get('jitter', 300)
+        if not Daemon.IsNumber(jitter) or jitter < 0:
+            raise ValueError(f'"jitter" must be a number of seconds, 0 or more: {jitter}')
+        subs = []
+        for entry in config.get('subscriptions', []):
+            if not entry.get('url') or not entry.get('dest'):
+                raise ValueError(f'Subscription is missing "url" or "dest": {entry}')
+            sub = dict(Daemon.defaults, **entry)
+            sub['dest'] = os.path.join(os.path.dirname(os.path.abspath(subsfile)), sub['dest']) #relative folders are relative to the subscriptions file
+            sub['mode'] = str(sub['mode']).upper()
+            if sub['mode'] not in Daemon.formats:
+                raise ValueError(f'Subscription mode must be A, V or AV: {entry}')
+            if sub['layout'] not in ('nested', 'sharded'):
+                raise ValueError(f'Subscription layout must be nested or sharded: {entry}')
+            if not Daemon.IsNumber(sub['interval']) or sub['interval'] <= 0:
+                raise ValueError(f'Subscription interval must be a positive number of minutes: {entry}')
+            if not isinstance(sub['priority'], int) or isinstance(sub['priority'], bool):
+                raise ValueError(f'Subscription priority must be a whole number: {entry}')
+            sub['key'] = sub['url'] + ' -> ' + sub['dest'] #the same channel may be archived to more than one folder
+            subs.append(sub)
+        return config, subs
+
+    def LoadState(statefile): #returns the persisted next run times, keyed by subscription
+        try:
+            with open(statefile, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def SaveState(statefile, state):
+        tmpfile = statefile + '.tmp'
+        with open(tmpfile, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmpfile, statefile) #replace atomically so a crash never leaves a half-written state file
+
+    def LinkType(dURL): #non-interactive version of mainfunc.ArchiveType
+        if '&list=' in dURL or '/playlist?list=' in dURL:
+            return 'playlist'
+        elif 'watch?v=' in dURL:
+            return 'single'
+        else:
+            return 'channel'
+
+    def BuildCommand(ytdl, sub):
+        dest = sub['dest']
+        link_type = Daemon.LinkType(sub['url'])
+        cmd = [ytdl, '--download-archive', dest + os.sep + sub['archive'] + '.txt', '-i', '--add-metadata']
+        if link_type != 'single':
+            cmd.append('--yes-playlist')
+        cmd.extend(Archive.archiveflags)
+        output = dest + os.sep + Archive.OutputTemplate(link_type, cmd, sub['layout'])
+        cmd.extend(['-f', Daemon.formats[sub['mode']], sub['url'], '-o', output])
+        return cmd
+
+    destlocks = {} #one lock per destination folder, so packing and indexing never run while another check still writes to it
+    destlockslock = threading.Lock()
+
+    def DestLock(dest):
+        with Daemon.destlockslock:
+            return Daemon.destlocks.setdefault(os.path.abspath(dest), threading.Lock())
+
+    def Check(ytdl, sub): #runs a single subscription to completion, logging the downloader output to the destination folder
+        with Daemon.DestLock(sub['dest']): #subscriptions sharing a folder are checked one at a time
+            Path(sub['dest']).mkdir(parents=True, exist_ok=True)
+            cmd = Daemon.BuildCommand(ytdl, sub)
+            Daemon.log(f'Checking {sub["url"]}')
+            with open(os.path.join(sub['dest'], 'daemon.log'), 'a', encoding='utf-8') as logfile:
+                logfile.write(f'\n[{time.strftime("%Y-%m-%d %H:%M:%S")}] {" ".join(cmd)}\n')
+                logfile.flush()
+                result = subprocess.run(cmd, stdout=logfile, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+            if sub['pack']:
+                Sidecars.Pack(sub['dest'])
+            if sub['layout'] == 'sharded':
+                Layout.BuildIndex(sub['dest'])
+            Daemon.log(f'Finished {sub["url"]} with exit code {result.returncode}')
+
+    def NextRun(sub, jitter): #spreads checks out so channels with the same interval do not all fire at once
+        return time.time() + sub['interval'] * 60 + random.uniform(0, jitter)
+
+    def run(ytdl, subsfile, workers=None):
+        config, subs = Daemon.LoadSubscriptions(subsfile)
+        if workers is None: #shared concurrency budget across all subscriptions, --workers overrides the file
+            workers = config.get('workers', 2)
+        Daemon.CheckWorkers(workers)
+        jitter = config.get('jitter', 300) #seconds
+        statefile = subsfile + '.state.json'
+        state = Daemon.LoadState(statefile)
+        lock = threading.Lock()
+        wake = threading.Event()
+        due = queue.PriorityQueue()
+        schedule = []
+        now = time.time()
+        for index, sub in enumerate(subs):
+            nextrun = state.get(sub['key'], now + random.uniform(0, jitter)) #new subscriptions start within the first jitter window
+            state[sub['key']] = nextrun
+            heapq.heappush(schedule, (nextrun, -sub['priority'], index))
+        state = {sub['key']: state[sub['key']] for sub in subs} #drops state of removed subscriptions
+        Daemon.SaveState(statefile, state)
+
+        def worker():
+            while True:
+                _, _, index = due.get()
+                sub = subs[index]
+                try:
+                    Daemon.Check(ytdl, sub)
+                except Exception as e:
+                    Daemon.log(f'Error while checking {sub["url"]}: {e}')
+                finally:
+                    nextrun = Daemon.NextRun(sub, jitter)
+                    with lock: #only reschedule once finished, so a slow channel is never queued twice
+                        state[sub['key']] = nextrun
+                        heapq.heappush(schedule, (nextrun, -sub['priority'], index))
+                        try:
+                            Daemon.SaveState(statefile, state)
+                        except OSError as e: #the next run is still scheduled in memory, it is only lost if the daemon restarts
+                            Daemon.log(f'Could not save {statefile}: {e}')
+                    wake.set()
+
+        for _ in range(0, workers):
+            threading.Thread(target=worker, daemon=True).start()
+
+        Daemon.log(f'Daemon started with {len(subs)} subscription(s) and {workers} worker(s)')
+        try:
+            while True:
+                wake.clear()
+                with lock:
+                    now = time.time()
+                    while schedule and schedule[0][0] <= now:
+                        nextrun, priority, index = heapq.heappop(schedule)
+                        due.put((priority, nextrun, index)) #when more checks are due than there are workers, the highest priority runs first
+                    timeout = schedule[0][0] - now if schedule else 60
+                wake.wait(min(timeout, 60))
+        except KeyboardInterrupt:
+            Daemon.log('Stopping daemon...')
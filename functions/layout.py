@@ -0,0 +1,208 @@
+import errno
+import json
+import os
+import re
+import time
+
+from functions.functions import YTA
+from functions.sidecars import Sidecars
+
+
+class Layout:
+
+    mediadir = 'media' #root of the sharded tree, relative to the destination folder
+    indexdir = 'index' #generated human-browsable view, relative to the destination folder
+    indexfile = 'index.tsv'
+    #two shard levels keyed by the first characters of the video ID, e.g. media/d/dQ/dQw4w9WgXcQ.mp4
+    #YouTube IDs use 64 characters, so the tree never grows past 64 + 4096 directories no matter how many videos are archived
+    output_template = mediadir + '/%(id.0:1)s/%(id.0:2)s/%(id)s.%(ext)s'
+
+    def ShardPath(dest, videoid): #returns the shard directory for a given video ID, mirroring output_template
+        return os.path.join(dest, Layout.mediadir, videoid[:1], videoid[:2])
+
+    def IsSidecar(filename):
+        return filename.lower().endswith(Sidecars.sidecars)
+
+    def SelectLayout():
+        while True:
+            print('\n[N]ested layout stores every video in its own folder, named after the uploader, date and title.\n[S]harded layout stores all files in a fixed set of folders keyed by video ID, with a generated index folder for browsing.')
+            layoutchoice = input('\nWhich layout would you like to use? N/S: ').upper()
+            if layoutchoice == 'N':
+                return 'nested'
+            elif layoutchoice == 'S':
+                return 'sharded'
+            else:
+                YTA.notvalid()
+                time.sleep(2)
+                continue
+
+    def Migrate(dest): #moves an archive made with the nested layout into the sharded layout, in place
+        moved = 0
+        skipped = 0
+        dest = os.path.abspath(dest)
+        skipdirs = {os.path.join(dest, Layout.mediadir), os.path.join(dest, Layout.indexdir)}
+        archived = Layout.ArchivedIDs(dest)
+        emptied = set()
+        for root, dirs, files in os.walk(dest):
+            dirs[:] = [d for d in dirs if os.path.join(root, d) not in skipdirs] #never walk into an already sharded tree or the generated index
+            for file in files:
+                match = Sidecars.idpattern.search(file)
+                if not match:
+                    continue
+                videoid, suffix = match.groups()
+                if archived and videoid not in archived: #not downloaded by the archiver, e.g. "My holiday [abcdefghijk].mkv"
+                    continue
+                sharddir = Layout.ShardPath(dest, videoid)
+                target = os.path.join(sharddir, videoid + suffix)
+                if os.path.exists(target):
+                    print(f'Skipping {os.path.join(root, file)}, {target} already exists')
+                    skipped += 1
+                    continue
+                os.makedirs(sharddir, exist_ok=True)
+                os.replace(os.path.join(root, file), target)
+                emptied.add(root)
+                moved += 1
+        Sidecars.Repath(dest, lambda path: Layout.MigratedPath(dest, path)) #keep packed sidecars extracting next to their media
+        for folder in sorted(emptied, key=len, reverse=True): #remove the per-video folders left empty by the move, and parents only emptied by that
+            while folder != dest:
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    break
+                folder = os.path.dirname(folder)
+        print(f'\nMoved {moved} file(s), skipped {skipped}')
+        return moved, skipped
+
+    def ArchivedIDs(dest): #returns the video IDs listed in the download archives (*.txt) in dest
+        archived = set()
+        for file in os.listdir(dest):
+            if not file.lower().endswith('.txt') or not os.path.isfile(os.path.join(dest, file)):
+                continue
+            with open(os.path.join(dest, file), encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) == 2: #lines look like "youtube dQw4w9WgXcQ"
+                        archived.add(fields[1])
+        return archived
+
+    def MigratedPath(dest, path): #returns where a file stored at path (relative to dest) ends up after Migrate, or None if it is not moved
+        match = Sidecars.idpattern.search(path.split('/')[-1])
+        if not match or path.startswith(Layout.mediadir + '/'):
+            return None
+        videoid, suffix = match.groups()
+        return os.path.relpath(os.path.join(Layout.ShardPath(dest, videoid), videoid + suffix), dest).replace(os.sep, '/')
+
+    def SafeName(name, maxbytes=200): #strips characters that are not allowed in file names on Windows, Linux or Mac
+        name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', str(name)).strip(' .')
+        name = name.encode('utf-8')[:maxbytes].decode('utf-8', 'ignore').strip(' .') #file names are limited to 255 bytes, not characters
+        return name or '_'
+
+    def ReadInfo(path): #reads a .info.json file, returning an empty dict if it is missing or broken
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def IndexLink(indexroot, row): #returns the symlink path of an index row, named after the uploader, date and title
+        videoid, upload_date, uploader, title, path = row
+        ending = f' [{videoid}]' + os.path.splitext(path)[1] #only the title is shortened, so the ID and extension are always kept
+        return os.path.join(indexroot, Layout.SafeName(uploader), Layout.SafeName(f'{upload_date} - {title}', 240 - len(ending.encode('utf-8'))) + ending)
+
+    def IndexField(value): #tabs and line breaks would split a row of index.tsv
+        return re.sub(r'[\t\r\n]+', ' ', str(value))
+
+    def ReadIndex(dest): #returns the rows of an existing index.tsv, keyed by path
+        rows = {}
+        try:
+            with open(os.path.join(dest, Layout.indexfile), encoding='utf-8') as f:
+                next(f, None) #skip the header
+                for line in f:
+                    row = line.rstrip('\n').split('\t')
+                    if len(row) == 5:
+                        rows[row[4]] = row
+        except OSError:
+            pass
+        return rows
+
+    def BuildIndex(dest): #updates index.tsv and the symlink view, only reading metadata of files not indexed yet
+        dest = os.path.abspath(dest)
+        mediaroot = os.path.join(dest, Layout.mediadir)
+        indexroot = os.path.join(dest, Layout.indexdir)
+        oldrows = Layout.ReadIndex(dest)
+        rows = {}
+        symlinks = True
+        conn = Sidecars.Open(dest) #info json files may have been packed
+        for root, dirs, files in os.walk(mediaroot):
+            dirs.sort()
+            for file in sorted(files):
+                if Layout.IsSidecar(file):
+                    continue
+                path = os.path.relpath(os.path.join(root, file), dest).replace(os.sep, '/')
+                row = oldrows.get(path)
+                if row is None:
+                    videoid = os.path.splitext(file)[0]
+                    info = Layout.ReadInfo(os.path.join(root, videoid + '.info.json')) or Sidecars.ReadPackedInfo(conn, videoid)
+                    row = [Layout.IndexField(field) for field in (videoid, info.get('upload_date') or 'NA', info.get('uploader') or info.get('channel') or 'Unknown', info.get('title') or videoid, path)]
+                rows[path] = row
+                if not symlinks:
+                    continue
+                link = Layout.IndexLink(indexroot, row)
+                if os.path.lexists(link):
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(link), exist_ok=True)
+                    os.symlink(os.path.relpath(os.path.join(root, file), os.path.dirname(link)), link)
+                except NotImplementedError:
+                    print('\nSymlinks are not supported, only index.tsv will be written')
+                    symlinks = False
+                except OSError as e:
+                    if e.errno in (errno.EPERM, errno.EACCES) or getattr(e, 'winerror', None) == 1314: #creating symlinks usually requires extra privileges on Windows
+                        print('\nCould not create symlinks, only index.tsv will be written')
+                        symlinks = False
+                    else:
+                        print(f'\nCould not create {link}: {e}')
+        if conn is not None:
+            conn.close()
+        for path, row in oldrows.items(): #remove links of media that no longer exists
+            if path not in rows:
+                link = Layout.IndexLink(indexroot, row)
+                try:
+                    os.remove(link)
+                    os.rmdir(os.path.dirname(link)) #only succeeds once the uploader has no links left
+                except OSError:
+                    pass
+        if rows != oldrows: #leave index.tsv untouched when nothing changed, so backups do not see it as modified
+            tmpfile = os.path.join(dest, Layout.indexfile + '.tmp')
+            with open(tmpfile, 'w', encoding='utf-8') as f:
+                f.write('id\tupload_date\tuploader\ttitle\tpath\n')
+                for row in rows.values():
+                    f.write('\t'.join(row) + '\n')
+            os.replace(tmpfile, os.path.join(dest, Layout.indexfile))
+        return len(rows)
+
+    def MigrateMenu():
+        YTA.clear()
+        while True:
+            dest = input('\nFolder of the archive to convert to the sharded layout: ').strip("\"' \t")
+            if not dest or not os.path.isdir(dest):
+                YTA.notvalid()
+                time.sleep(2)
+                continue
+            break
+        print(f'\nEvery file ending in "[video ID].ext" below {dest} will be moved into {os.path.join(dest, Layout.mediadir)}, and emptied folders removed.')
+        while True:
+            confirm = input('\nContinue? Y/N: ').upper()
+            if confirm == 'Y':
+                break
+            elif confirm == 'N':
+                return
+            else:
+                YTA.notvalid()
+                time.sleep(2)
+                continue
+        Layout.Migrate(dest)
+        print('\nBuilding index...')
+        count = Layout.BuildIndex(dest)
+        print(f'Indexed {count} file(s)')
+        input('\nPress enter to return to the main menu')
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+from functions.functions import YTA
+
+
+class Sidecars:
+
+    packfile = 'sidecars.db' #per-destination pack, relative to the destination folder
+    packed = ('.info.json', '.description', '.annotations.xml', '.vtt', '.srt', '.ass', '.ttml', '.srv1', '.srv2', '.srv3', '.json3') #thumbnails are left alone as they are already compressed
+    sidecars = packed + ('.jpg', '.jpeg', '.png', '.webp', '.part', '.ytdl') #every file written next to the media that is not media itself
+    idpattern = re.compile(r'\[([0-9A-Za-z_-]{11})\]((?:\.[^.\[\]]+)+)$') #matches the "[id].ext" ending used by the nested output templates, YouTube IDs are always 11 characters
+
+    def VideoID(path): #returns the video ID of a file in either the nested or the sharded layout, or None
+        filename = os.path.basename(path)
+        match = Sidecars.idpattern.search(filename)
+        if match:
+            return match.group(1)
+        videoid = filename.split('.')[0]
+        parent = os.path.dirname(path)
+        if videoid and os.path.basename(parent) == videoid[:2] and os.path.basename(os.path.dirname(parent)) == videoid[:1]: #media/d/dQ/dQw4w9WgXcQ.info.json
+            return videoid
+        return None
+
+    def Open(dest, create=False): #returns a connection to the pack, or None if there is no pack and create is False
+        path = os.path.join(dest, Sidecars.packfile)
+        if not create and not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(path, timeout=60) #wait for another running instance packing the same folder
+        conn.execute('CREATE TABLE IF NOT EXISTS sidecars (path TEXT PRIMARY KEY, id TEXT NOT NULL, data BLOB NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS sidecars_id ON sidecars (id)')
+        return conn
+
+    def Pack(dest): #moves every loose sidecar below dest into the compressed pack
+        dest = os.path.abspath(dest)
+        packedfiles = []
+        conn = Sidecars.Open(dest, create=True)
+        try:
+            for root, dirs, files in os.walk(dest):
+                for file in files:
+                    if not file.lower().endswith(Sidecars.packed):
+                        continue
+                    path = os.path.join(root, file)
+                    videoid = Sidecars.VideoID(path)
+                    if not videoid:
+                        continue
+                    with open(path, 'rb') as f:
+                        data = zlib.compress(f.read(), 9)
+                    relpath = os.path.relpath(path, dest).replace(os.sep, '/') #stored with forward slashes so packs can be moved between systems
+                    conn.execute('INSERT OR REPLACE INTO sidecars (path, id, data) VALUES (?, ?, ?)', (relpath, videoid, data))
+                    packedfiles.append(path)
+            conn.commit()
+        finally:
+            conn.close()
+        for path in packedfiles: #only removed once the pack has been committed
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e: #e.g. locked on Windows, the file is already packed so it is only left behind
+                print(f'Could not remove {path}: {e}')
+        return len(packedfiles)
+
+    def Read(conn, videoid): #returns all sidecars of a video as {path: bytes}
+        rows = conn.execute('SELECT path, data FROM sidecars WHERE id = ?', (videoid,))
+        return {path: zlib.decompress(data) for path, data in rows}
+
+    def ReadPackedInfo(conn, videoid): #returns the packed .info.json of a video, or an empty dict
+        if conn is None:
+            return {}
+        row = conn.execute("SELECT data FROM sidecars WHERE id = ? AND path LIKE '%.info.json'", (videoid,)).fetchone()
+        if not row:
+            return {}
+        try:
+            return json.loads(zlib.decompress(row[0]))
+        except ValueError:
+            return {}
+
+    def Repath(dest, repath): #rewrites stored paths with repath(path), used when an archive is moved to a new layout
+        conn = Sidecars.Open(dest)
+        if conn is None:
+            return
+        try:
+            for (path,) in conn.execute('SELECT path FROM sidecars').fetchall():
+                newpath = repath(path)
+                if newpath and newpath != path:
+                    conn.execute('UPDATE OR REPLACE sidecars SET path = ? WHERE path = ?', (newpath, path))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def Extract(dest, videoid=None): #regenerates loose sidecars from the pack, for one video or all of them, without overwriting existing files
+        dest = os.path.abspath(dest)
+        conn = Sidecars.Open(dest)
+        if conn is None:
+            print(f'\nNo {Sidecars.packfile} found in {dest}')
+            return 0
+        extracted = 0
+        try:
+            if videoid:
+                rows = Sidecars.Read(conn, videoid).items()
+            else:
+                rows = ((path, zlib.decompress(data)) for path, data in conn.execute('SELECT path, data FROM sidecars'))
+            for relpath, data in rows:
+                path = os.path.join(dest, *relpath.split('/'))
+                if os.path.exists(path):
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                extracted += 1
+        finally:
+            conn.close()
+        return extracted
+
+    def SelectPack():
+        while True:
+            print('\nSidecars (info json, description, annotations and subtitles) can be stored in a single compressed file per destination folder instead of as loose files.\nThey can be extracted again at any time from the main menu.')
+            pack = input('\nWould you like to pack the sidecars? Y/N: ').upper()
+            if pack == 'Y':
+                return True
+            elif pack == 'N':
+                return False
+            else:
+                YTA.notvalid()
+                time.sleep(2)
+                continue
+
+    def ExtractMenu():
+        YTA.clear()
+        while True:
+            dest = input('\nFolder of the archive to extract sidecars in: ').strip("\"' \t")
+            if not dest or not os.path.isdir(dest):
+                YTA.notvalid()
+                time.sleep(2)
+                continue
+            break
+        videoid = input('\nVideo ID to extract, or leave empty to extract all: ').strip()
+        count = Sidecars.Extract(dest, videoid)
+        print(f'\nExtracted {count} file(s)')
+        input('\nPress enter to return to the main menu')